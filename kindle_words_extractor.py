@@ -6,15 +6,24 @@ import csv
 import os
 import sys
 import argparse
-from typing import Tuple, List, Dict, Optional, Set
+from typing import Tuple, List, Dict, Optional, Set, FrozenSet, Iterator
 from tqdm import tqdm
 import re
 import requests
+from requests.adapters import HTTPAdapter
 import json
+import hashlib
+import threading
+from functools import lru_cache
+from pathlib import Path
+from collections import namedtuple
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
 
-# 导入配置文件
+# 导入配置文件（缺少时的警告在main()中输出，作为模块导入时不打印）
 try:
     from config import AI_API_CONFIG
+    CONFIG_MISSING = False
 except ImportError:
     # 默认配置，以防配置文件不存在
     AI_API_CONFIG = {
@@ -22,29 +31,182 @@ except ImportError:
         "API_URL": "https://dashscope.aliyuncs.com/compatible-mode/v1/chat/completions",
         "MODEL": "qwen-turbo-latest"
     }
-    print("警告: 未找到配置文件config.py，将使用默认配置")
+    CONFIG_MISSING = True
+
+# 词典查询的字段列表（不读取未使用的audio字段）
+STARDICT_COLUMNS = "word, phonetic, translation, definition, pos, collins, oxford, tag, bnc, frq, exchange, detail"
+# 词典记录，可按字段名访问
+DictEntry = namedtuple('DictEntry', STARDICT_COLUMNS)
+# 批量查询时每条SQL绑定的参数个数（SQLite默认上限为999）
+SQL_BATCH_SIZE = 500
+# 从Kindle数据库读取单词时每批过滤和查询词典的单词数
+EXTRACT_BATCH_SIZE = 1000
+# 联接查询拼接来源时使用的分隔符（ASCII单元分隔符char(31)，不会出现在例句文本中）
+USAGE_SEPARATOR = '\x1f'
+# 同时进行的AI翻译请求数（网络请求为I/O密集型，使用线程并发）
+AI_MAX_WORKERS = 16
+# AI翻译结果的本地缓存文件，重复运行时相同的单词和例句无需再次请求
+AI_CACHE_FILE = '.ai_cache.sqlite'
+
+# 匹配非字母数字字符（与str.isalnum()一致，支持Unicode）
+NON_ALNUM_RE = re.compile(r'[\W_]+')
+# 删除ASCII范围内非字母数字字符的转换表
+ASCII_NON_ALNUM_TABLE = str.maketrans('', '', ''.join(chr(i) for i in range(128) if not chr(i).isalnum()))
+# 匹配HTML标签
+HTML_TAG_RE = re.compile(r'<[^>]*>')
+# 从CSV第一列的HTML中提取单词（兼容旧版本的几种输出格式）
+WORD_EXTRACT_RE = re.compile(r'<div class="word-display">([^<]+)</div>|word-title">([^<]+)</div>|<strong>([^<]+)</strong>')
+
+# 词形变化类型对应的中文名称
+EXCHANGE_LABELS = {
+    'p': '过去式',
+    'd': '过去分词',
+    'i': '现在分词',
+    '3': '第三人称单数',
+    'r': '比较级',
+    't': '最高级',
+    's': '复数',
+    '0': '原形',
+    '1': '类别1',
+    'f': '未来式'
+}
+
+# 词典条目各分节的开头，预先生成带标题和不带标题两种形式
+SECTION_TITLES = ('发音与词性', '释义', '词频信息', '词形变化', '补充信息')
+SECTION_HEADS = {title: f'<div class="section"><div class="section-title">{title}</div>' for title in SECTION_TITLES}
+PLAIN_SECTION_HEADS = dict.fromkeys(SECTION_TITLES, '<div class="section">')
+
+# 词典数据库的SQLite调优参数：64MB页缓存、256MB内存映射
+DICT_PRAGMAS = {
+    "cache_size": "-65536",
+    "temp_store": "MEMORY",
+    "mmap_size": "268435456",
+}
+# 建立索引后词典只读：关闭日志和同步写入，禁止修改
+DICT_READONLY_PRAGMAS = {
+    "query_only": "ON",
+    "journal_mode": "OFF",
+    "synchronous": "OFF",
+}
+# Kindle数据库只读，不修改其日志模式
+KINDLE_PRAGMAS = {
+    "query_only": "ON",
+    "cache_size": "-65536",
+    "temp_store": "MEMORY",
+    "mmap_size": "268435456",
+}
+
+
+def _strip_word(word: str) -> str:
+    """去除单词中的连字符等非字母数字字符并转为小写，对应词典的sw字段"""
+    # 先转小写再用转换表删除ASCII标点，只有仍含其他符号（如弯引号）时才使用正则
+    stripped = word.lower().translate(ASCII_NON_ALNUM_TABLE)
+    if stripped and not stripped.isalnum():
+        stripped = NON_ALNUM_RE.sub('', stripped)
+    return stripped
+
+
+@lru_cache(maxsize=20000)
+def _parse_exchange(exchange: Optional[str]) -> Tuple[Optional[str], Tuple[Tuple[str, str], ...]]:
+    """一次扫描解析词形变化字段，返回(原型, ((类型, 词形), ...))（按字段内容缓存）"""
+    if not exchange:
+        return (None, ())
+    root = None
+    pairs = []
+    for part in exchange.split('/'):
+        label, sep, forms = part.partition(':')
+        if not sep:
+            continue
+        if label == '0' and root is None:
+            root = forms  # 0: 表示原型
+        pairs.append((label, forms))
+    return (root, tuple(pairs))
+
+
+def _nl2br(text: str) -> str:
+    """将词典字段中的\\n转义换行替换为<br>"""
+    return text.replace('\\n', '<br>')
+
+
+def _extract_root(exchange: Optional[str]) -> Optional[str]:
+    """从词形变化字段中提取原型"""
+    return _parse_exchange(exchange)[0]
+
+
+def _apply_pragmas(conn: sqlite3.Connection, pragmas: Dict[str, str]):
+    """为数据库连接设置PRAGMA参数"""
+    for name, value in pragmas.items():
+        try:
+            conn.execute(f"PRAGMA {name}={value}")
+        except sqlite3.Error:
+            pass  # 不支持的参数（如只读文件无法切换WAL）则忽略
+
+
+def _connect_existing(db_path: str, mode: str, immutable: bool = False, **kwargs) -> sqlite3.Connection:
+    """以URI方式打开已存在的数据库（不会自动创建空文件），文件不存在时抛出FileNotFoundError"""
+    uri = f"{Path(os.path.abspath(db_path)).as_uri()}?mode={mode}"
+    if immutable:
+        # 声明文件在运行期间不会被修改，SQLite不再加锁和检查日志文件
+        uri += "&immutable=1"
+    try:
+        return sqlite3.connect(uri, uri=True, **kwargs)
+    except sqlite3.OperationalError as e:
+        raise FileNotFoundError(f"无法打开数据库 {db_path}: {e}") from e
 
 
 class KindleVocabularyExtractor:
     """从Kindle数据库提取词汇"""
     
     def __init__(self, db_file: str):
-        if not os.path.exists(db_file):
-            raise FileNotFoundError(f"找不到Kindle数据库: {db_file}")
-        
-        self.conn = sqlite3.connect(db_file)
-        self.conn.row_factory = sqlite3.Row
+        # Kindle数据库只读打开，文件不存在时直接报错
+        # 不使用immutable：那样会忽略尚未写回主文件的-wal/日志中的最近查词记录
+        self.conn = _connect_existing(db_file, 'ro')
+        _apply_pragmas(self.conn, KINDLE_PRAGMAS)
         self.cursor = self.conn.cursor()
     
-    def extract_words(self, limit: Optional[int] = None) -> List[Dict[str, str]]:
-        """提取单词和来源"""
-        query = """
+    def _use_correlated_usages(self) -> bool:
+        """判断能否用按w.id关联的子查询逐词取前三个来源"""
+        # 子查询依赖LOOKUPS(word_key)上的索引（Kindle自带lookupwordkey），SQLite不会为其自动建索引，
+        # 缺少索引时每个单词都要全表扫描LOOKUPS；只读打开也无法补建索引
+        has_index = False
+        for index in self.cursor.execute("PRAGMA index_list(LOOKUPS)").fetchall():
+            name = index[1].replace('"', '""')
+            columns = self.cursor.execute(f'PRAGMA index_info("{name}")').fetchall()
+            if columns and columns[0][2] == 'word_key':
+                has_index = True
+                break
+        if not has_index:
+            return False
+        # 多条WORDS记录拼写相同时，GROUP BY w.word只保留其中一个w.id，需用联接合并所有记录的来源
+        duplicate = self.cursor.execute("SELECT 1 FROM WORDS GROUP BY word HAVING COUNT(*) > 1 LIMIT 1").fetchone()
+        return duplicate is None
+    
+    def extract_words(self, limit: Optional[int] = None) -> Iterator[Dict[str, str]]:
+        """逐条提取单词和来源"""
+        # 在SQL中完成去除'en:'前缀、清理来源（去除空白、跳过空来源）
+        correlated = self._use_correlated_usages()
+        if correlated:
+            # 每个单词只取前三个来源并直接拼接
+            usages_sql = """(SELECT GROUP_CONCAT(u.usage, '<br>---<br>')
+             FROM (SELECT trim(l.usage, char(32, 9, 10, 13)) as usage
+                   FROM LOOKUPS l
+                   WHERE l.word_key = w.id AND trim(l.usage, char(32, 9, 10, 13)) <> ''
+                   LIMIT 3) u)"""
+            join_sql = ""
+        else:
+            # 联接后由SQLite自动建立临时索引，前三个来源在Python中截取
+            usages_sql = "GROUP_CONCAT(NULLIF(trim(l.usage, char(32, 9, 10, 13)), ''), char(31))"
+            join_sql = "LEFT JOIN LOOKUPS l ON l.word_key = w.id"
+        
+        query = f"""
         SELECT 
-            w.word as word,
+            CASE WHEN instr(w.word, ':') > 0
+                 THEN substr(w.word, instr(w.word, ':') + 1)
+                 ELSE w.word END as word,
             w.stem as stem,
-            GROUP_CONCAT(l.usage, '|||') as usages
+            {usages_sql} as usages
         FROM WORDS w
-        LEFT JOIN LOOKUPS l ON w.id = l.word_key
+        {join_sql}
         GROUP BY w.word
         ORDER BY w.timestamp DESC
         """
@@ -52,33 +214,24 @@ class KindleVocabularyExtractor:
         if limit:
             query += f"\nLIMIT {limit}"
         
-        words_list = []
         try:
             self.cursor.execute(query)
+            # 每次批量取出多行，减少逐行读取的开销
+            self.cursor.arraysize = 1000
             
-            for row in self.cursor:
-                word = row['word']
-                stem = row['stem']
-                if ':' in word:  # 处理类似 'en:word' 格式的单词
-                    word = word.split(':', 1)[1]
+            while True:
+                rows = self.cursor.fetchmany()
+                if not rows:
+                    break
                 
-                # 处理来源列表
-                usages = row['usages']
-                if usages:
-                    # 分割多个来源，只保留前三个
-                    usage_list = usages.split('|||')[:3]
-                    # 清理每个来源并合并
-                    cleaned_usages = '<br>---<br>'.join(u.strip() for u in usage_list if u.strip())
-                else:
-                    cleaned_usages = ''
-                
-                words_list.append({
-                    '单词': word,
-                    '原型': stem,
-                    '来源': cleaned_usages
-                })
-            
-            return words_list
+                for word, stem, usages in rows:
+                    if usages and not correlated:
+                        usages = '<br>---<br>'.join(usages.split(USAGE_SEPARATOR)[:3])
+                    yield {
+                        '单词': word,
+                        '原型': stem,
+                        '来源': usages or ''
+                    }
         
         except sqlite3.Error as e:
             raise Exception(f"从Kindle数据库提取单词时出错: {e}")
@@ -91,452 +244,367 @@ class KindleVocabularyExtractor:
 class ECDICTDictionary:
     """ECDICT词典查询"""
     
-    def __init__(self, db_path: str):
-        if not os.path.exists(db_path):
-            raise FileNotFoundError(f"找不到词典数据库: {db_path}")
-        
-        self.conn = sqlite3.connect(db_path)
+    def __init__(self, db_path: str, covering_index: bool = False, in_memory: bool = False):
+        # 需要建立索引，以读写方式打开；扩大预编译语句缓存，重复的查询语句无需重新解析
+        self.conn = _connect_existing(db_path, 'rw', cached_statements=256)
+        _apply_pragmas(self.conn, DICT_PRAGMAS)
+        self.cursor = self.conn.cursor()
+        # 按实例缓存查询结果，限制缓存大小以控制内存占用
+        self._lookup_cached = lru_cache(maxsize=20000)(self._lookup_raw)
+        
+        # 添加小写单词列和索引以提升查询速度
+        # table_xinfo才会列出生成列
+        columns = {row[1] for row in self.cursor.execute("PRAGMA table_xinfo(stardict)")}
+        indexes = {row[0] for row in self.cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'stardict'")}
+        # 列和索引都已建立时跳过，避免每次启动都获取写锁
+        if 'word_lc' not in columns or not {'idx_word_lc', 'idx_sw'} <= indexes or 'idx_word_lower' in indexes:
+            try:
+                # 所有结构修改放在同一个事务中完成
+                self.cursor.execute("BEGIN IMMEDIATE")
+                if 'word_lc' not in columns:
+                    print("首次运行，正在为词典建立小写单词索引，请耐心等待...")
+                    try:
+                        # 优先使用虚拟生成列，无需回填数据
+                        self.cursor.execute(
+                            "ALTER TABLE stardict ADD COLUMN word_lc TEXT GENERATED ALWAYS AS (LOWER(word)) VIRTUAL"
+                        )
+                    except sqlite3.OperationalError:
+                        # SQLite低于3.31不支持生成列，改为普通列并回填
+                        self.cursor.execute("ALTER TABLE stardict ADD COLUMN word_lc TEXT")
+                        self.cursor.execute("UPDATE stardict SET word_lc = LOWER(word)")
+                self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_word_lc ON stardict(word_lc)")
+                self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_sw ON stardict(sw)")
+                self.cursor.execute("DROP INDEX IF EXISTS idx_word_lower")
+                # 收集新索引的统计信息，供查询优化器使用
+                self.cursor.execute("ANALYZE stardict")
+                self.conn.commit()
+                columns.add('word_lc')
+                indexes |= {'idx_word_lc', 'idx_sw'}
+            except sqlite3.Error:
+                self.conn.rollback()  # 如数据库不可写，退回到LOWER(word)查询
+        
+        # 可选：为模糊匹配建立包含所有查询字段的覆盖索引，查询时无需回表
+        if covering_index:
+            try:
+                if 'idx_sw_cover' not in indexes:
+                    print("正在为词典建立覆盖索引，词典文件将明显增大，请耐心等待...")
+                    self.cursor.execute(f"CREATE INDEX idx_sw_cover ON stardict(sw, {STARDICT_COLUMNS})")
+                    indexes.add('idx_sw_cover')
+                # 覆盖索引没有统计信息时优化器总是选择有统计信息的idx_sw，需重新收集
+                if not self._has_index_stats('idx_sw_cover'):
+                    self.cursor.execute("ANALYZE stardict")
+                if self.conn.in_transaction:
+                    self.conn.commit()
+            except sqlite3.Error as e:
+                self.conn.rollback()
+                print(f"建立覆盖索引失败，将使用普通索引: {e}")
+        
+        # 精确匹配所用的小写单词表达式
+        self.word_key = 'word_lc' if 'word_lc' in columns else 'LOWER(word)'
+        self.table = 'stardict'
+        
+        # 结构已建立，重新以只读、不加锁的方式打开词典
+        self.conn.close()
+        self.conn = _connect_existing(db_path, 'ro', immutable=True, cached_statements=256)
+        _apply_pragmas(self.conn, DICT_PRAGMAS)
         self.cursor = self.conn.cursor()
-        self._cache = {}
         
-        # 添加索引以提升查询速度
-        try:
-            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_word_lower ON stardict(LOWER(word))")
-            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_sw ON stardict(sw)")
+        # 可选：将词典复制到内存数据库中查询，避免磁盘I/O
+        if in_memory:
+            print("正在将词典载入内存...")
+            self.cursor.execute("ATTACH DATABASE ':memory:' AS mem")
+            self.cursor.execute(
+                f"CREATE TABLE mem.stardict AS SELECT {STARDICT_COLUMNS}, sw, {self.word_key} AS word_lc FROM main.stardict"
+            )
+            self.cursor.execute("CREATE INDEX mem.idx_word_lc ON stardict(word_lc)")
+            self.cursor.execute("CREATE INDEX mem.idx_sw ON stardict(sw)")
             self.conn.commit()
-        except sqlite3.Error:
-            pass  # 如果索引已存在则忽略
+            self.word_key = 'word_lc'
+            self.table = 'mem.stardict'
+        
+        # 以下只做查询，切换为只读模式
+        _apply_pragmas(self.conn, DICT_READONLY_PRAGMAS)
+        
+        self._sql_exact = f"SELECT {STARDICT_COLUMNS} FROM {self.table} WHERE {self.word_key} = ?"
+        self._sql_sw = f"SELECT {STARDICT_COLUMNS} FROM {self.table} WHERE sw = ?"
+    
+    def _has_index_stats(self, index: str) -> bool:
+        """判断ANALYZE是否已为指定索引收集统计信息"""
+        try:
+            return self.cursor.execute("SELECT 1 FROM sqlite_stat1 WHERE idx = ?", (index,)).fetchone() is not None
+        except sqlite3.OperationalError:
+            return False  # 从未执行过ANALYZE，没有sqlite_stat1表
     
     def lookup_word(self, word: str) -> Tuple[str, Optional[str]]:
         """查询单词释义，返回(释义HTML, 词形变化原型)元组"""
-        word_lower = word.lower()
-        if word_lower in self._cache:
-            return self._cache[word_lower]
-        
+        result, word_root = self.lookup_raw(word)
+        if result:
+            return (self._format_entry(result), word_root)
+        return ("未找到释义", None)
+    
+    def lookup_raw(self, word: str) -> Tuple[Optional[DictEntry], Optional[str]]:
+        """查询单词的词典记录，返回(词典记录, 词形变化原型)元组"""
+        return self._lookup_cached(word.lower())
+    
+    def _lookup_raw(self, word: str) -> Tuple[Optional[DictEntry], Optional[str]]:
+        """查询小写单词的词典记录（未经缓存）"""
         # 首先尝试精确匹配
-        query = """
-        SELECT word, phonetic, translation, definition, pos, collins, oxford, tag, bnc, frq, exchange, detail, audio
-        FROM stardict 
-        WHERE LOWER(word) = LOWER(?)
-        """
-        
-        self.cursor.execute(query, (word,))
+        self.cursor.execute(self._sql_exact, (word,))
         result = self.cursor.fetchone()
         
         if not result:
             # 如果找不到，尝试模糊匹配（去除连字符等）
-            stripped_word = ''.join(c.lower() for c in word if c.isalnum())
-            query = """
-            SELECT word, phonetic, translation, definition, pos, collins, oxford, tag, bnc, frq, exchange, detail, audio
-            FROM stardict 
-            WHERE sw = ?
-            """
-            self.cursor.execute(query, (stripped_word,))
+            self.cursor.execute(self._sql_sw, (_strip_word(word),))
             result = self.cursor.fetchone()
         
         if result:
-            # 提取词形变化中的原型
-            exchange = result[10]  # exchange字段
-            word_root = None
-            if exchange:
-                for part in exchange.split('/'):
-                    if part.startswith('0:'):  # 0: 表示原型
-                        word_root = part.split(':', 1)[1]
-                        break
-            
-            entry = self._format_entry(result)
-            self._cache[word_lower] = (entry, word_root)
-            return (entry, word_root)
-        return ("未找到释义", None)
+            entry = DictEntry._make(result)
+            return (entry, _extract_root(entry.exchange))
+        return (None, None)
     
-    def _format_entry(self, result: tuple) -> str:
-        """格式化词典条目"""
-        word, phonetic, translation, definition, pos, collins, oxford, tag, bnc, frq, exchange, detail, audio = result
-        
-        # 基础样式
-        css_style = """
-        <style>
-        .dict-entry, .word-entry {
-            font-family: "SF Pro Text", "Helvetica Neue", Arial, sans-serif;
-            line-height: 1.6;
-            margin: 15px 0;
-            padding: 15px;
-            border-radius: 8px;
-            background-color: #f8f9fa;
-            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        }
-        .section {
-            margin: 10px 0;
-            padding: 8px;
-            border-left: 3px solid #007bff;
-            background-color: white;
-            border-radius: 4px;
-        }
-        .section-title {
-            color: #0056b3;
-            font-weight: bold;
-            margin-bottom: 5px;
-            font-size: 1.1em;
-        }
-        .phonetic {
-            color: #6c757d;
-            font-family: "Courier New", monospace;
-            margin-right: 10px;
-        }
-        .pos {
-            color: #28a745;
-            font-weight: 500;
-        }
-        .freq-info {
-            display: flex;
-            flex-wrap: wrap;
-            gap: 10px;
-        }
-        .freq-item {
-            background-color: #e9ecef;
-            padding: 4px 8px;
-            border-radius: 4px;
-            font-size: 0.9em;
-            color: #495057;
-        }
-        .definition {
-            margin: 5px 0;
-            padding-left: 10px;
-            border-left: 2px solid #dee2e6;
-            color: #212529;
-            text-align: left;
-        }
-        .chinese {
-            color: #d63384;
-        }
-        .english {
-            color: #0d6efd;
-        }
-        .word-title {
-            font-size: 1.4em;
-            font-weight: bold;
-            color: #2c3e50;
-            margin-bottom: 10px;
-        }
-        .source {
-            color: #6c757d;
-            margin-top: 8px;
-            padding: 8px;
-            border-left: 2px solid #dee2e6;
-            text-align: left;
-        }
-        </style>
-        """
-        
-        entry = [css_style, '<div class="dict-entry">']
-        
-        # 1. 音标和词性
-        if phonetic or pos:
-            section = ['<div class="section">']
-            section.append('<div class="section-title">发音与词性</div>')
-            if phonetic:
-                section.append(f'<span class="phonetic">[{phonetic}]</span>')
-            if pos:
-                section.append(f'<span class="pos">{pos}</span>')
-            section.append('</div>')
-            entry.append(''.join(section))
-        
-        # 2. 释义（移到词频信息之前）
-        if translation or definition:
-            section = ['<div class="section">']
-            section.append('<div class="section-title">释义</div>')
-            if translation:
-                section.append('<div class="definition chinese">')
-                section.append(translation.replace('\\n', '<br>'))
-                section.append('</div>')
-            if definition:
-                section.append('<div class="definition english">')
-                section.append(definition.replace('\\n', '<br>'))
-                section.append('</div>')
-            section.append('</div>')
-            entry.append(''.join(section))
-        
-        # 3. 词频信息
-        freq_info = []
-        if collins or oxford or bnc or frq or tag:
-            section = ['<div class="section">']
-            section.append('<div class="section-title">词频信息</div>')
-            section.append('<div class="freq-info">')
-            
-            if collins:
-                stars = "⭐" * int(collins)
-                freq_info.append(f'<span class="freq-item">柯林斯星级：{stars}</span>')
-            if oxford:
-                freq_info.append('<span class="freq-item">牛津核心词汇</span>')
-            if bnc:
-                freq_info.append(f'<span class="freq-item">BNC词频：{bnc}</span>')
-            if frq:
-                freq_info.append(f'<span class="freq-item">词频顺序：{frq}</span>')
-            if tag:
-                freq_info.append(f'<span class="freq-item">标签：{tag}</span>')
-            
-            section.append(''.join(freq_info))
-            section.append('</div></div>')
-            entry.append(''.join(section))
+    def lookup_many(self, words: List[str]) -> Dict[str, Optional[DictEntry]]:
+        """批量查询单词，返回{小写单词: 词典记录}字典，找不到的单词对应None"""
+        requested = list(dict.fromkeys(w.lower() for w in words if w))
+        results = {}
+        
+        # 首先批量精确匹配
+        for i in range(0, len(requested), SQL_BATCH_SIZE):
+            chunk = requested[i:i + SQL_BATCH_SIZE]
+            placeholders = ','.join('?' * len(chunk))
+            self.cursor.execute(
+                f"SELECT {STARDICT_COLUMNS} FROM {self.table} WHERE {self.word_key} IN ({placeholders})",
+                chunk
+            )
+            for row in self.cursor.fetchall():
+                results.setdefault(row[0].lower(), DictEntry._make(row))
+        
+        # 剩余的单词批量模糊匹配（去除连字符等）
+        stripped_words = {}
+        for word in requested:
+            if word not in results:
+                stripped_word = _strip_word(word)
+                if stripped_word:
+                    stripped_words.setdefault(stripped_word, []).append(word)
+        
+        stripped_list = list(stripped_words)
+        for i in range(0, len(stripped_list), SQL_BATCH_SIZE):
+            chunk = stripped_list[i:i + SQL_BATCH_SIZE]
+            placeholders = ','.join('?' * len(chunk))
+            self.cursor.execute(
+                f"SELECT sw, {STARDICT_COLUMNS} FROM {self.table} WHERE sw IN ({placeholders})",
+                chunk
+            )
+            for row in self.cursor.fetchall():
+                for word in stripped_words.get(row[0].lower(), []):
+                    results.setdefault(word, DictEntry._make(row[1:]))
+        
+        return {word: results.get(word) for word in requested}
+    
+    @staticmethod
+    def _format_entry(result: DictEntry) -> str:
+        """格式化词典条目（带分节标题）"""
+        return ECDICTDictionary._render_entry(result)
+    
+    @staticmethod
+    def format_entry_with_source(result: DictEntry, source_text: str) -> str:
+        """格式化带有来源的词典条目（不带分节标题）"""
+        return ECDICTDictionary._render_entry(result, source_text, show_titles=False)
+    
+    @staticmethod
+    def _render_entry(result: DictEntry, source_text: Optional[str] = None, show_titles: bool = True) -> str:
+        """生成词典条目HTML，可选插入来源例句和分节标题"""
+        word, phonetic, translation, definition, pos, collins, oxford, tag, bnc, frq, exchange, detail = result
         
-        # 4. 词形变化
-        if exchange:
-            section = ['<div class="section">']
-            section.append('<div class="section-title">词形变化</div>')
-            exchange_parts = []
-            for part in exchange.split('/'):
-                if ':' in part:
-                    label, forms = part.split(':')
-                    labels = {
-                        'p': '过去式',
-                        'd': '过去分词',
-                        'i': '现在分词',
-                        '3': '第三人称单数',
-                        'r': '比较级',
-                        't': '最高级',
-                        's': '复数',
-                        '0': '原形',
-                        '1': '类别1',
-                        'f': '未来式'
-                    }
-                    label = labels.get(label, label)
-                    exchange_parts.append(f'<span class="freq-item">{label}: {forms}</span>')
-            section.append('<div class="freq-info">')
-            section.append(''.join(exchange_parts))
-            section.append('</div></div>')
-            entry.append(''.join(section))
-        
-        # 5. 补充信息
-        if detail:
-            section = ['<div class="section">']
-            section.append('<div class="section-title">补充信息</div>')
-            section.append('<div class="definition">')
-            section.append(detail.replace('\\n', '<br>'))
-            section.append('</div></div>')
-            entry.append(''.join(section))
-        
-        entry.append('</div>')
-        return '\n'.join(entry)
-    
-    def format_entry_with_source(self, result: tuple, source_text: str) -> str:
-        """格式化带有来源的词典条目"""
-        word, phonetic, translation, definition, pos, collins, oxford, tag, bnc, frq, exchange, detail, audio = result
-        
-        # 基础样式
-        css_style = """
-        <style>
-        .dict-entry, .word-entry {
-            font-family: "SF Pro Text", "Helvetica Neue", Arial, sans-serif;
-            line-height: 1.6;
-            margin: 15px 0;
-            padding: 15px;
-            border-radius: 8px;
-            background-color: #f8f9fa;
-            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        }
-        .section {
-            margin: 10px 0;
-            padding: 8px;
-            border-left: 3px solid #007bff;
-            background-color: white;
-            border-radius: 4px;
-        }
-        .phonetic {
-            color: #6c757d;
-            font-family: "Courier New", monospace;
-            margin-right: 10px;
-        }
-        .pos {
-            color: #28a745;
-            font-weight: 500;
-        }
-        .freq-info {
-            display: flex;
-            flex-wrap: wrap;
-            gap: 10px;
-        }
-        .freq-item {
-            background-color: #e9ecef;
-            padding: 4px 8px;
-            border-radius: 4px;
-            font-size: 0.9em;
-            color: #495057;
-        }
-        .definition {
-            margin: 5px 0;
-            padding-left: 10px;
-            border-left: 2px solid #dee2e6;
-            color: #212529;
-            text-align: left;
-        }
-        .chinese {
-            color: #d63384;
-        }
-        .english {
-            color: #0d6efd;
-        }
-        .word-title {
-            font-size: 1.4em;
-            font-weight: bold;
-            color: #2c3e50;
-            margin-bottom: 10px;
-        }
-        .source {
-            color: #6c757d;
-            margin-top: 8px;
-            padding: 8px;
-            border-left: 2px solid #dee2e6;
-            text-align: left;
-        }
-        .highlight {
-            color: #d63384;
-            font-weight: bold;
-            padding: 0 2px;
-        }
-        .ai-explanation {
-            margin-top: 12px;
-            background-color: #f1f8ff;
-            padding: 10px;
-            border-radius: 6px;
-            border-left: 3px solid #58a6ff;
-        }
-        .ai-content {
-            white-space: pre-line;
-        }
-        .ai-error {
-            color: #d63384;
-            font-style: italic;
-            margin-top: 8px;
-        }
-        </style>
-        """
+        heads = SECTION_HEADS if show_titles else PLAIN_SECTION_HEADS
         
-        entry = [css_style, '<div class="dict-entry">']
+        parts = ['<div class="dict-entry">']
         
         # 1. 音标和词性
         if phonetic or pos:
-            section = ['<div class="section">']
+            parts.append(heads['发音与词性'])
             if phonetic:
-                section.append(f'<span class="phonetic">[{phonetic}]</span>')
+                parts.append(f'<span class="phonetic">[{phonetic}]</span>')
             if pos:
-                section.append(f'<span class="pos">{pos}</span>')
-            section.append('</div>')
-            entry.append(''.join(section))
+                parts.append(f'<span class="pos">{pos}</span>')
+            parts.append('</div>')
         
-        # 2. 来源例句 (新增部分)
+        # 2. 来源例句
         if source_text:
-            section = ['<div class="section">']
-            section.append(f'<div class="source">{source_text}</div>')
-            section.append('</div>')
-            entry.append(''.join(section))
+            parts.append(f'<div class="section"><div class="source">{source_text}</div></div>')
         
         # 3. 释义
         if translation or definition:
-            section = ['<div class="section">']
+            text = heads['释义']
             if translation:
-                section.append('<div class="definition chinese">')
-                section.append(translation.replace('\\n', '<br>'))
-                section.append('</div>')
+                text += f'<div class="definition chinese">{translation}</div>'
             if definition:
-                section.append('<div class="definition english">')
-                section.append(definition.replace('\\n', '<br>'))
-                section.append('</div>')
-            section.append('</div>')
-            entry.append(''.join(section))
+                text += f'<div class="definition english">{definition}</div>'
+            # 中英文释义合并后只做一次换行替换
+            parts.append(_nl2br(text + '</div>'))
         
         # 4. 词频信息
-        freq_info = []
         if collins or oxford or bnc or frq or tag:
-            section = ['<div class="section">']
-            section.append('<div class="freq-info">')
-            
+            parts.extend((heads['词频信息'], '<div class="freq-info">'))
             if collins:
-                stars = "⭐" * int(collins)
-                freq_info.append(f'<span class="freq-item">柯林斯星级：{stars}</span>')
+                parts.append(f'<span class="freq-item">柯林斯星级：{"⭐" * int(collins)}</span>')
             if oxford:
-                freq_info.append('<span class="freq-item">牛津核心词汇</span>')
+                parts.append('<span class="freq-item">牛津核心词汇</span>')
             if bnc:
-                freq_info.append(f'<span class="freq-item">BNC词频：{bnc}</span>')
+                parts.append(f'<span class="freq-item">BNC词频：{bnc}</span>')
             if frq:
-                freq_info.append(f'<span class="freq-item">词频顺序：{frq}</span>')
+                parts.append(f'<span class="freq-item">词频顺序：{frq}</span>')
             if tag:
-                freq_info.append(f'<span class="freq-item">标签：{tag}</span>')
-            
-            section.append(''.join(freq_info))
-            section.append('</div></div>')
-            entry.append(''.join(section))
+                parts.append(f'<span class="freq-item">标签：{tag}</span>')
+            parts.append('</div></div>')
         
         # 5. 词形变化
         if exchange:
-            section = ['<div class="section">']
-            exchange_parts = []
-            for part in exchange.split('/'):
-                if ':' in part:
-                    label, forms = part.split(':')
-                    labels = {
-                        'p': '过去式',
-                        'd': '过去分词',
-                        'i': '现在分词',
-                        '3': '第三人称单数',
-                        'r': '比较级',
-                        't': '最高级',
-                        's': '复数',
-                        '0': '原形',
-                        '1': '类别1',
-                        'f': '未来式'
-                    }
-                    label = labels.get(label, label)
-                    exchange_parts.append(f'<span class="freq-item">{label}: {forms}</span>')
-            section.append('<div class="freq-info">')
-            section.append(''.join(exchange_parts))
-            section.append('</div></div>')
-            entry.append(''.join(section))
+            parts.extend((heads['词形变化'], '<div class="freq-info">'))
+            for label, forms in _parse_exchange(exchange)[1]:
+                parts.append(f'<span class="freq-item">{EXCHANGE_LABELS.get(label, label)}: {forms}</span>')
+            parts.append('</div></div>')
         
         # 6. 补充信息
         if detail:
-            section = ['<div class="section">']
-            section.append('<div class="definition">')
-            section.append(detail.replace('\\n', '<br>'))
-            section.append('</div></div>')
-            entry.append(''.join(section))
+            parts.extend((heads['补充信息'], '<div class="definition">', _nl2br(detail), '</div></div>'))
         
-        entry.append('</div>')
-        return '\n'.join(entry)
+        parts.append('</div>')
+        return ''.join(parts)
     
     def close(self):
         self.conn.close()
 
 
-def _highlight_word(text: str, word: str) -> str:
-    """在文本中用颜色标记目标单词及其变体"""
-    # 处理可能的词形变化
-    word_patterns = [
+@lru_cache(maxsize=20000)
+def _gen_inflections(word: str) -> FrozenSet[str]:
+    """按常见构词规则生成单词可能的词形变化（按单词缓存）"""
+    word = word.lower()
+    if not word:
+        return frozenset()
+    
+    forms = {
         word,  # 原形
-        word + 's',  # 复数
+        word + 's',  # 复数/第三人称单数
         word + 'es',  # 复数变体
         word + 'ed',  # 过去式
-        word + 'd',  # 过去式变体
         word + 'ing',  # 现在分词
-        word[:-1] + 'ing' if word.endswith('e') else '',  # 去e加ing
-        word + word[-1] + 'ing' if word[-1] in 'aeiou' and len(word) > 1 else '',  # 双写字母加ing
-    ]
-    
-    # 移除空字符串
-    word_patterns = [p for p in word_patterns if p]
-    
-    # 构建正则表达式，不区分大小写
-    pattern = '|'.join(map(re.escape, word_patterns))
-    pattern = f'\\b({pattern})\\b'
-    
-    # 使用HTML标签添加颜色样式
-    highlighted = re.sub(
-        pattern,
-        lambda m: f'<span class="highlight">{m.group()}</span>',
-        text,
-        flags=re.IGNORECASE
-    )
+    }
+    if word.endswith('e'):
+        forms.add(word + 'd')  # 加d的过去式，如 like -> liked
+        forms.add(word[:-1] + 'ing')  # 去e加ing，如 write -> writing
+    if len(word) > 1 and word.endswith('y') and word[-2] not in 'aeiou':
+        forms.add(word[:-1] + 'ies')  # 变y为i，如 study -> studies
+        forms.add(word[:-1] + 'ied')
+    if len(word) > 2 and word[-1] not in 'aeiouwxy' and word[-2] in 'aeiou' and word[-3] not in 'aeiou':
+        forms.add(word + word[-1] + 'ed')  # 双写末尾辅音，如 stop -> stopped
+        forms.add(word + word[-1] + 'ing')
+    return frozenset(forms)
+
+
+@lru_cache(maxsize=4096)
+def _collect_forms(word: str, stem: str, result: Optional[DictEntry]) -> FrozenSet[str]:
+    """收集需要高亮的词形，优先使用词典exchange字段中列出的真实词形变化"""
+    # 类型1表示该词本身是哪种变化，其值并非单词，不参与匹配
+    exchange_forms = {forms.lower() for label, forms in _parse_exchange(result.exchange if result else None)[1]
+                      if label != '1' and forms}
+    if exchange_forms:
+        return frozenset(exchange_forms | {word.lower(), stem.lower(), result.word.lower()})
+    # 词典中没有词形变化信息时，退回到按构词规则推测
+    return _gen_inflections(word) | _gen_inflections(stem)
+
+
+@lru_cache(maxsize=4096)
+def _compile_highlight_pattern(forms: FrozenSet[str]) -> 're.Pattern':
+    """构建匹配所有词形的正则表达式（按词形集合缓存编译结果）"""
+    # 将以其他词形开头的词形归并到该词形下，如 stop(?:ping|ped|s|)，减少分支回溯
+    groups: Dict[str, List[str]] = {}
+    for form in sorted(forms, key=len):
+        base = next((b for b in sorted(groups, key=len, reverse=True) if form.startswith(b)), None)
+        if base is None:
+            groups[form] = ['']
+        else:
+            groups[base].append(form[len(base):])
     
-    return highlighted
+    alternatives = []
+    # 较长的词形优先匹配，不区分大小写
+    for base, suffixes in sorted(groups.items(), key=lambda g: len(g[0]) + max(map(len, g[1])), reverse=True):
+        if len(suffixes) == 1:
+            alternatives.append(re.escape(base))
+        else:
+            tails = '|'.join(map(re.escape, sorted(suffixes, key=len, reverse=True)))
+            alternatives.append(f'{re.escape(base)}(?:{tails})')
+    return re.compile(f'\\b({"|".join(alternatives)})\\b', re.IGNORECASE)
+
+
+def _wrap_highlight(match: 're.Match') -> str:
+    """使用HTML标签添加颜色样式"""
+    return f'<span class="highlight">{match.group()}</span>'
+
+
+@lru_cache(maxsize=8192)
+def _highlight_all(text: str, forms: FrozenSet[str]) -> str:
+    """在文本中用颜色标记所有给定的词形，只需一次替换（按例句和词形集合缓存）"""
+    if not forms:
+        return text
+    # 例句中不含任何词形时无需编译和运行正则
+    lowered = text.lower()
+    if not any(form in lowered for form in forms):
+        return text
+    return _compile_highlight_pattern(forms).sub(_wrap_highlight, text)
+
+
+_ai_session: Optional[requests.Session] = None
+_ai_session_lock = threading.Lock()
+_ai_cache: Optional[sqlite3.Connection] = None
+_ai_cache_lock = threading.Lock()
+
+
+def _get_ai_session() -> requests.Session:
+    """获取共享的HTTP会话，复用TCP/TLS连接"""
+    global _ai_session
+    # 多个翻译线程同时首次调用时，由锁保证只创建一个会话
+    with _ai_session_lock:
+        if _ai_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=AI_MAX_WORKERS, pool_maxsize=AI_MAX_WORKERS)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _ai_session = session
+        return _ai_session
+
+
+def _ai_cache_key(word: str, sentence: str, model: str) -> str:
+    """AI翻译缓存的键：模型、单词和去除标签后例句的SHA-1"""
+    return hashlib.sha1(f"{model}\t{word}\t{sentence}".encode('utf-8')).hexdigest()
+
+
+def _ai_cache_get(key: str) -> Optional[str]:
+    """从本地缓存读取AI翻译结果，缓存不可用时返回None"""
+    global _ai_cache
+    with _ai_cache_lock:
+        try:
+            if _ai_cache is None:
+                # 多个翻译线程共用同一连接，由锁保证串行访问
+                _ai_cache = sqlite3.connect(AI_CACHE_FILE, check_same_thread=False)
+                _ai_cache.execute("CREATE TABLE IF NOT EXISTS ai_cache (k TEXT PRIMARY KEY, v TEXT)")
+                _ai_cache.commit()
+            row = _ai_cache.execute("SELECT v FROM ai_cache WHERE k = ?", (key,)).fetchone()
+            return row[0] if row else None
+        except sqlite3.Error:
+            return None  # 缓存出错时直接请求API
+
+
+def _ai_cache_put(key: str, value: str):
+    """将成功的AI翻译结果写入本地缓存"""
+    with _ai_cache_lock:
+        if _ai_cache is None:
+            return
+        try:
+            _ai_cache.execute("INSERT OR REPLACE INTO ai_cache (k, v) VALUES (?, ?)", (key, value))
+            _ai_cache.commit()
+        except sqlite3.Error:
+            pass
 
 
 def _translate_with_ai(word: str, sentence: str, api_key: str = None, api_url: str = None, model: str = None) -> str:
@@ -554,8 +622,14 @@ def _translate_with_ai(word: str, sentence: str, api_key: str = None, api_url: s
     if not api_key:
         return "<div class='ai-error'>未配置API密钥，请在config.py中设置API_KEY</div>"
     
-    # 移除HTML标签
-    clean_sentence = re.sub(r'<.*?>', '', sentence)
+    # 移除HTML标签（不含标签时无需替换）
+    clean_sentence = HTML_TAG_RE.sub('', sentence) if '<' in sentence else sentence
+    
+    # 优先使用本地缓存的结果
+    cache_key = _ai_cache_key(word, clean_sentence, model)
+    cached = _ai_cache_get(cache_key)
+    if cached is not None:
+        return cached
     
     # 构建请求头
     headers = {
@@ -580,7 +654,7 @@ def _translate_with_ai(word: str, sentence: str, api_key: str = None, api_url: s
     
     try:
         # 发送API请求
-        response = requests.post(api_url, headers=headers, json=payload, timeout=30)
+        response = _get_ai_session().post(api_url, headers=headers, json=payload, timeout=30)
         response_data = response.json()
         
         # 检查响应是否成功
@@ -593,6 +667,8 @@ def _translate_with_ai(word: str, sentence: str, api_key: str = None, api_url: s
                 <div class="ai-content">{ai_explanation}</div>
             </div>"""
             
+            # 只缓存成功的结果，失败的请求下次重新尝试
+            _ai_cache_put(cache_key, formatted_explanation)
             return formatted_explanation
         else:
             # 如果请求失败，返回错误信息
@@ -603,6 +679,53 @@ def _translate_with_ai(word: str, sentence: str, api_key: str = None, api_url: s
         return f"<div class='ai-error'>API请求出错: {str(e)}</div>"
 
 
+def _format_row(task: Tuple[str, str, str, Optional[DictEntry], str]) -> List[str]:
+    """将单词、原型、例句、词典记录和AI解释格式化为一行CSV数据"""
+    word, stem, source_text, result, ai_explanation = task
+    
+    # 高亮处理例句
+    if source_text:
+        # 一次性高亮原句中单词和原型的所有相关形式
+        forms = _collect_forms(word, stem, result)
+        highlighted_source = _highlight_all(source_text, forms)
+        # 如果AI解释为空，则不添加
+        if ai_explanation:
+            # 减小例句和AI解释之间的间隔
+            highlighted_source = f"{highlighted_source}<br>{ai_explanation}"
+    else:
+        highlighted_source = ""
+    
+    # 确定最终显示的单词，如果有原型单词，优先使用它
+    display_word = word
+    
+    # 获取合适的词典释义
+    if result:
+        display_word = _extract_root(result.exchange) or word
+        
+        # 使用新方法生成带有例句的词典条目
+        dictionary_entry = ECDICTDictionary.format_entry_with_source(result, highlighted_source)
+    else:
+        # 如果找不到词典释义
+        source_section = (f"<div class='section'><div class='source'>{highlighted_source}</div></div>"
+                          if highlighted_source else "")
+        dictionary_entry = f"<div class='dict-entry'>{source_section}<div class='section'>未找到释义</div></div>"
+    
+    # 为第一个字段创建美化的单词显示（不含缩进和换行，样式由styling.css提供）
+    word_html = f'<div class="word-container"><div class="word-display">{display_word}</div></div>'
+    
+    return [word_html, dictionary_entry]
+
+
+def _ends_with_newline(path: str) -> bool:
+    """检查文件是否为空或以换行符结尾"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+
 def get_existing_words(csv_file: str) -> Set[str]:
     """获取现有CSV文件中已存在的单词"""
     if not os.path.exists(csv_file):
@@ -610,80 +733,29 @@ def get_existing_words(csv_file: str) -> Set[str]:
     
     existing_words = set()
     try:
-        with open(csv_file, 'r', encoding='utf-8') as infile:
+        with open(csv_file, 'r', newline='', encoding='utf-8') as infile:
             reader = csv.reader(infile)
-            # 跳过标题行（如果有）
-            try:
-                first_row = next(reader)
-                # 检查是否有列标题
-                if len(first_row) == 2 and first_row[0] != first_row[1]:
-                    # 这可能是标题行，不处理
-                    pass
-                else:
-                    # 尝试从HTML内容中提取单词
-                    word_html = first_row[0]
-                    # 尝试多种提取模式
-                    patterns = [
-                        r'<div class="word-display">(.*?)</div>',
-                        r'word-title">(.*?)</div>',
-                        r'<strong>(.*?)</strong>'
-                    ]
-                    for pattern in patterns:
-                        word_match = re.search(pattern, word_html)
-                        if word_match:
-                            word = word_match.group(1).lower().strip()
-                            existing_words.add(word)
-                            break
-            except StopIteration:
-                pass  # 文件是空的
-                
-            # 读取剩余行
             for row in reader:
-                if len(row) >= 1:
-                    # 尝试从HTML内容中提取单词
-                    word_html = row[0]
-                    # 尝试多种提取模式
-                    extracted = False
-                    patterns = [
-                        r'<div class="word-display">(.*?)</div>',
-                        r'word-title">(.*?)</div>',
-                        r'<strong>(.*?)</strong>'
-                    ]
-                    for pattern in patterns:
-                        word_match = re.search(pattern, word_html)
-                        if word_match:
-                            word = word_match.group(1).lower().strip()
-                            existing_words.add(word)
-                            extracted = True
-                            break
-                    
-                    # 如果没有通过正则提取到，尝试更简单的HTML清理方式
-                    if not extracted and word_html:
-                        # 移除所有HTML标签
-                        clean_word = re.sub(r'<.*?>', '', word_html).strip().lower()
-                        if clean_word and len(clean_word) < 30:  # 避免添加整个文本块
-                            words = re.findall(r'\b[a-zA-Z]+\b', clean_word)
-                            if words:
-                                existing_words.add(words[0])  # 添加第一个单词
-        
-        # 添加常见词形变化以提高匹配率
-        expanded_words = set(existing_words)
-        for word in existing_words:
-            # 处理常见的词形变化
-            if word.endswith('s') and len(word) > 2:
-                expanded_words.add(word[:-1])  # 可能的单数形式
-            if word.endswith('es') and len(word) > 3:
-                expanded_words.add(word[:-2])  # 可能的单数形式
-            if word.endswith('ed') and len(word) > 3:
-                expanded_words.add(word[:-2])  # 可能的原形
-                if len(word) > 4 and word[-3] == word[-4]:  # 双写辅音，如stopped->stop
-                    expanded_words.add(word[:-3])
-            if word.endswith('ing') and len(word) > 4:
-                expanded_words.add(word[:-3])  # 可能的原形
-                expanded_words.add(word[:-3] + 'e')  # 如writing->write
-        
-        existing_words = expanded_words
-        print(f"从现有CSV文件中读取了 {len(existing_words)} 个单词（包含词形变化）")
+                if not row or not row[0]:
+                    continue
+                word_html = row[0]
+                
+                # 一次匹配所有已知格式
+                word_match = WORD_EXTRACT_RE.search(word_html)
+                if word_match:
+                    word = next(g for g in word_match.groups() if g)
+                    existing_words.add(word.lower().strip())
+                    continue
+                
+                # 如果没有通过正则提取到，尝试更简单的HTML清理方式
+                clean_word = HTML_TAG_RE.sub('', word_html).strip().lower()
+                if clean_word and len(clean_word) < 30:  # 避免添加整个文本块
+                    words = re.findall(r'\b[a-zA-Z]+\b', clean_word)
+                    if words:
+                        existing_words.add(words[0])  # 添加第一个单词
+        
+        # 词形变化由词典exchange字段匹配，这里不再猜测
+        print(f"从现有CSV文件中读取了 {len(existing_words)} 个单词")
         return existing_words
     except Exception as e:
         print(f"读取现有CSV文件时出错: {e}")
@@ -691,7 +763,9 @@ def get_existing_words(csv_file: str) -> Set[str]:
 
 
 def process_kindle_vocabulary(kindle_db: str, dict_db: str, output_file: Optional[str] = None, limit: Optional[int] = None, 
-                              ai_translation: bool = True, incremental_update: bool = True) -> Tuple[str, int]:
+                              ai_translation: bool = True, incremental_update: bool = True,
+                              covering_index: bool = False, in_memory: bool = False,
+                              ai_on_missing: bool = False) -> Tuple[str, int]:
     """处理Kindle词汇并添加词典释义"""
     # 如果没有指定输出文件，使用默认名称
     if output_file is None:
@@ -704,250 +778,89 @@ def process_kindle_vocabulary(kindle_db: str, dict_db: str, output_file: Optiona
         if incremental_update and os.path.exists(output_file):
             existing_words = get_existing_words(output_file)
         
-        # 1. 提取Kindle单词
+        # 1. 提取Kindle单词（生成器，逐批读取）
         kindle_extractor = KindleVocabularyExtractor(kindle_db)
-        all_words_list = kindle_extractor.extract_words(limit)
-        kindle_extractor.close()
-        
-        # 如果是增量更新，过滤出新单词
-        if incremental_update and existing_words:
-            total_kindle_words = len(all_words_list)
-            new_words_list = []
+        all_words = kindle_extractor.extract_words(limit)
+        
+        # 2. 初始化词典（过滤新单词和查询释义共用同一连接）
+        dictionary = ECDICTDictionary(dict_db, covering_index, in_memory)
+        filter_existing = incremental_update and bool(existing_words)
+        
+        # 3. 边读取边分批查询词典记录，增量更新时只保留新单词，不在内存中保存完整的单词列表
+        print("\n正在提取单词并查询词典释义...")
+        tasks = []
+        total_kindle_words = 0
+        while True:
+            batch = list(islice(all_words, EXTRACT_BATCH_SIZE))
+            if not batch:
+                break
+            total_kindle_words += len(batch)
             
-            # 初始化词典以便查询单词原型
-            dictionary = ECDICTDictionary(dict_db)
+            # 批量查询本批单词原型的词典记录，避免逐词查询数据库
+            entries = dictionary.lookup_many([w['原型'] or w['单词'] for w in batch])
             
-            for word_info in all_words_list:
-                word = word_info['单词'].lower()
-                stem = word_info['原型'].lower() if word_info['原型'] else word
-                
-                # 收集所有可能的单词形式
-                possible_forms = set([word, stem])
+            for word_info in batch:
+                word = word_info['单词']
+                stem = word_info['原型'] or word  # 使用原型查询，如果没有原型则使用原单词
+                result = entries.get(stem.lower())
                 
-                # 尝试从词典获取更多可能的形式
-                try:
-                    # 查询词典以获取可能的词形变化
-                    self_cursor = dictionary.cursor
-                    self_cursor.execute(
-                        "SELECT exchange FROM stardict WHERE LOWER(word) = LOWER(?)", 
-                        (stem,)
-                    )
-                    exchange_result = self_cursor.fetchone()
-                    
-                    # 尝试提取可能的原型
-                    if exchange_result and exchange_result[0]:
-                        exchange = exchange_result[0]
-                        for part in exchange.split('/'):
-                            if ':' in part:
-                                _, forms = part.split(':', 1)
-                                if forms:
-                                    for form in forms.split('/'):
-                                        possible_forms.add(form.lower())
-                except Exception:
-                    pass  # 忽略词典查询错误
+                # 增量更新时跳过单词、原型或其词形变化已在CSV中出现的单词
+                if filter_existing:
+                    possible_forms = {word.lower(), stem.lower()}
+                    if result:
+                        for _, forms in _parse_exchange(result.exchange)[1]:
+                            if forms:
+                                possible_forms.add(forms.lower())
+                    if not existing_words.isdisjoint(possible_forms):
+                        continue
                 
-                # 检查是否所有可能的形式都不在现有单词列表中
-                is_new_word = True
-                for form in possible_forms:
-                    if form in existing_words:
-                        is_new_word = False
-                        break
+                # 处理例句，只保留第一个例句
+                source_text = word_info['来源']
+                if source_text and '---' in source_text:
+                    source_text = source_text.split('---')[0].strip()
                 
-                if is_new_word:
-                    new_words_list.append(word_info)
-            
-            # 关闭词典连接
-            dictionary.close()
-            
-            duplicate_words = total_kindle_words - len(new_words_list)
+                tasks.append((word, stem, source_text, result, ""))
+        kindle_extractor.close()
+        
+        if filter_existing:
             print(f"Kindle数据库中共有 {total_kindle_words} 个单词")
-            print(f"其中与CSV文件重复的单词数: {duplicate_words} 个")
-            print(f"需要处理的新单词数: {len(new_words_list)} 个")
-            words_list = new_words_list
-        else:
-            words_list = all_words_list
+            print(f"其中与CSV文件重复的单词数: {total_kindle_words - len(tasks)} 个")
+            print(f"需要处理的新单词数: {len(tasks)} 个")
         
         # 如果没有新单词需要处理，直接返回
-        if not words_list:
+        if not tasks:
+            dictionary.close()
             print("没有新单词需要处理，退出程序")
             return output_file, 0
         
-        # 2. 初始化词典
-        dictionary = ECDICTDictionary(dict_db)
-        
-        # 3. 处理每个单词并添加词典释义
-        total_words = len(words_list)
-        print(f"\n开始查询 {total_words} 个单词的词典释义...")
-        
-        # 准备新的行数据
-        new_rows = []
-        with tqdm(total=total_words, desc="处理进度") as pbar:
-            for word_info in words_list:
-                word = word_info['单词']
-                stem = word_info['原型'] or word  # 使用原型查询，如果没有原型则使用原单词
-                source_text = word_info['来源']
-                
-                # 处理例句，只保留第一个例句
-                if source_text and '---' in source_text:
-                    source_text = source_text.split('---')[0].strip()
-                
-                # 高亮处理例句
-                if source_text:
-                    # 高亮显示原句中的所有相关形式
-                    highlighted_source = _highlight_word(source_text, word)
-                    
-                    # 如果stem不同于word，也高亮stem
-                    if stem and stem != word:
-                        highlighted_source = _highlight_word(highlighted_source, stem)
-                    
-                    # 如果启用了AI翻译，获取单词在例句中的含义解释
-                    ai_explanation = ""
-                    if ai_translation and source_text:
-                        print(f"\n正在翻译单词 '{word}' 在例句中的含义...")
-                        ai_explanation = _translate_with_ai(word, source_text)
-                        # 如果AI解释为空，则不添加
-                        if ai_explanation:
-                            # 减小例句和AI解释之间的间隔
-                            highlighted_source = f"{highlighted_source}<br>{ai_explanation}"
-                else:
-                    highlighted_source = ""
-                
-                # 使用stem查询词典
-                query = stem
-                self_cursor = dictionary.cursor
-                self_cursor.execute(
-                    "SELECT word, phonetic, translation, definition, pos, collins, oxford, tag, bnc, frq, exchange, detail, audio "
-                    "FROM stardict WHERE LOWER(word) = LOWER(?)", 
-                    (query,)
-                )
-                result = self_cursor.fetchone()
-                
-                if not result:
-                    # 如果找不到，尝试模糊匹配（去除连字符等）
-                    stripped_word = ''.join(c.lower() for c in query if c.isalnum())
-                    self_cursor.execute(
-                        "SELECT word, phonetic, translation, definition, pos, collins, oxford, tag, bnc, frq, exchange, detail, audio "
-                        "FROM stardict WHERE sw = ?", 
-                        (stripped_word,)
-                    )
-                    result = self_cursor.fetchone()
-                
-                # 确定最终显示的单词
-                display_word = word
-                
-                # 获取合适的词典释义
-                if result:
-                    # 提取词形变化中的原型
-                    exchange = result[10]  # exchange字段
-                    if exchange:
-                        for part in exchange.split('/'):
-                            if part.startswith('0:'):  # 0: 表示原型
-                                root = part.split(':', 1)[1]
-                                # 如果有原型单词，优先使用它
-                                display_word = root
-                                break
-                    
-                    # 使用新方法生成带有例句的词典条目
-                    dictionary_entry = dictionary.format_entry_with_source(result, highlighted_source)
-                else:
-                    # 如果找不到词典释义
-                    css_style = """
-                    <style>
-                    .dict-entry {
-                        font-family: "SF Pro Text", "Helvetica Neue", Arial, sans-serif;
-                        line-height: 1.6;
-                        margin: 15px 0;
-                        padding: 15px;
-                        border-radius: 8px;
-                        background-color: #f8f9fa;
-                        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-                    }
-                    .section {
-                        margin: 10px 0;
-                        padding: 8px;
-                        border-left: 3px solid #007bff;
-                        background-color: white;
-                        border-radius: 4px;
-                    }
-                    .source {
-                        color: #6c757d;
-                        margin-top: 8px;
-                        padding: 8px;
-                        border-left: 2px solid #dee2e6;
-                        text-align: left;
-                    }
-                    </style>
-                    """
-                    dictionary_entry = f"{css_style}<div class='dict-entry'>"
-                    if highlighted_source:
-                        dictionary_entry += f"<div class='section'><div class='source'>{highlighted_source}</div></div>"
-                    dictionary_entry += "<div class='section'>未找到释义</div></div>"
-                
-                # 为第一个字段创建美化的单词显示
-                word_html = f"""
-                <style>
-                .word-container {{
-                    font-family: "SF Pro Text", "Helvetica Neue", Arial, sans-serif;
-                    line-height: 1.6;
-                    margin: 15px 0;
-                    padding: 15px;
-                    border-radius: 8px;
-                    background-color: #f8f9fa;
-                    box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-                    text-align: center;
-                }}
-                .word-display {{
-                    font-size: 1.8em;
-                    font-weight: bold;
-                    color: #2c3e50;
-                    margin: 10px 0;
-                    text-shadow: 1px 1px 2px rgba(0,0,0,0.1);
-                }}
-                </style>
-                <div class="word-container">
-                    <div class="word-display">{display_word}</div>
-                </div>
-                """
-                
-                # 添加到新的行数据
-                new_rows.append({
-                    '单词': word_html,
-                    '释义与例句': dictionary_entry
-                })
-                
-                pbar.update(1)
-        
-        # 4. 写入输出文件
-        if incremental_update and os.path.exists(output_file):
-            # 增量更新模式：读取现有内容，追加新内容
-            existing_rows = []
-            try:
-                with open(output_file, 'r', newline='', encoding='utf-8') as infile:
-                    reader = csv.reader(infile)
-                    for row in reader:
-                        if row:  # 确保行不为空
-                            existing_rows.append(row)
-            except Exception as e:
-                print(f"读取现有CSV文件内容时出错: {e}")
-                existing_rows = []
-            
-            # 将新行添加到现有内容中
-            with open(output_file, 'w', newline='', encoding='utf-8') as outfile:
-                writer = csv.writer(outfile)
-                # 写入现有内容
-                for row in existing_rows:
-                    writer.writerow(row)
-                # 写入新内容
-                for row_dict in new_rows:
-                    writer.writerow([row_dict['单词'], row_dict['释义与例句']])
-        else:
-            # 全新写入模式
-            with open(output_file, 'w', newline='', encoding='utf-8') as outfile:
-                fieldnames = ['单词', '释义与例句']
-                writer = csv.DictWriter(outfile, fieldnames=fieldnames)
-                # 不写入CSV标题行
-                # writer.writeheader()
-                writer.writerows(new_rows)
+        total_words = len(tasks)
+        
+        # 如果启用了AI翻译，多线程并发获取单词在例句中的含义解释
+        if ai_translation:
+            # 默认跳过词典中查不到的单词（多为人名、拼写错误等）
+            ai_indices = [i for i, task in enumerate(tasks) if task[2] and (task[3] or ai_on_missing)]
+            if ai_indices:
+                print(f"\n正在使用AI翻译 {len(ai_indices)} 个单词在例句中的含义...")
+                with ThreadPoolExecutor(max_workers=AI_MAX_WORKERS) as executor:
+                    explanations = executor.map(_translate_with_ai,
+                                                [tasks[i][0] for i in ai_indices],
+                                                [tasks[i][2] for i in ai_indices])
+                    for i, ai_explanation in zip(ai_indices,
+                                                 tqdm(explanations, total=len(ai_indices), desc="AI翻译", mininterval=0.5)):
+                        tasks[i] = tasks[i][:4] + (ai_explanation,)
+        
+        # 4. 增量更新模式直接追加到现有文件末尾，无需读取并重写已有内容
+        append = incremental_update and os.path.exists(output_file)
+        if append and not _ends_with_newline(output_file):
+            # 上次写入的最后一行缺少换行时先补上，避免与新行粘连
+            with open(output_file, 'a', newline='', encoding='utf-8') as outfile:
+                outfile.write('\r\n')
+        
+        # 边格式化边写入输出文件，不在内存中累积新行
+        with open(output_file, 'a' if append else 'w', newline='', encoding='utf-8', buffering=1 << 20) as outfile:
+            writer = csv.writer(outfile)
+            for task in tqdm(tasks, total=total_words, desc="处理进度", mininterval=0.5):
+                writer.writerow(_format_row(task))
         
         # 5. 关闭词典
         dictionary.close()
@@ -960,6 +873,9 @@ def process_kindle_vocabulary(kindle_db: str, dict_db: str, output_file: Optiona
 
 
 def main():
+    if CONFIG_MISSING:
+        print("警告: 未找到配置文件config.py，将使用默认配置")
+    
     parser = argparse.ArgumentParser(description='Kindle单词提取和词典查询工具')
     parser.add_argument('kindle_db', nargs='?', default='vocab.db',
                       help='Kindle词汇数据库文件路径 (.db)，默认为当前目录下的vocab.db')
@@ -969,6 +885,12 @@ def main():
     parser.add_argument('-l', '--limit', type=int, help='限制处理的单词数量（可选）')
     parser.add_argument('--no-ai', action='store_true', help='禁用AI翻译功能')
     parser.add_argument('-f', '--full', action='store_true', help='全量更新模式，处理所有单词')
+    parser.add_argument('--covering-index', action='store_true',
+                      help='为词典建立覆盖索引以加快模糊匹配（会显著增大词典文件）')
+    parser.add_argument('--in-memory', action='store_true',
+                      help='将词典载入内存后再查询（占用较多内存，适合大量单词）')
+    parser.add_argument('--ai-on-missing', action='store_true',
+                      help='对词典中查不到的单词也调用AI翻译（默认跳过）')
     
     args = parser.parse_args()
     
@@ -1000,7 +922,10 @@ def main():
             args.output,
             args.limit,
             not args.no_ai,  # 取反，如果--no-ai被指定，则禁用AI翻译
-            not args.full    # 取反，如果--full被指定，则不使用增量更新
+            not args.full,   # 取反，如果--full被指定，则不使用增量更新
+            args.covering_index,
+            args.in_memory,
+            args.ai_on_missing
         )
         print(f"\n处理完成！")
         print(f"成功处理 {count} 个单词")